@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import feedparser
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import calendar
+import time
+from finbert_service import load_finbert, predict_batch
 
 # =========================
 # PAGE CONFIG
@@ -24,28 +27,10 @@ st.title("📊 Stock News Sentiment Analyzer (FinBERT Powered)")
 # =========================
 # LOAD FINBERT
 # =========================
-@st.cache_resource
-def load_finbert():
-    tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-    model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
-    return tokenizer, model
-
-tokenizer, model = load_finbert()
-
-def analyze_sentiment(text):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    scores = torch.nn.functional.softmax(outputs.logits, dim=-1)
-    labels = ['negative', 'neutral', 'positive']
-    sentiment = labels[torch.argmax(scores)]
-    score = scores[0][torch.argmax(scores)].item()
-    if sentiment == "positive":
-        return 1 * score
-    elif sentiment == "negative":
-        return -1 * score
-    else:
-        return 0
+# Spinner wrapper around finbert_service's process-wide model
+@st.cache_resource(show_spinner="Loading FinBERT...")
+def warm_finbert():
+    load_finbert()
 
 # =========================
 # USER INPUT
@@ -55,34 +40,204 @@ ticker = st.text_input("Enter Stock Ticker (e.g. AAPL, TSLA):", "").upper()
 # =========================
 # FETCH NEWS VIA RSS
 # =========================
-def fetch_news_rss(ticker):
-    url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US"
-    feed = feedparser.parse(url)
+MAX_ARTICLES = 20
+
+@st.cache_resource
+def load_http_session():
+    session = requests.Session()
+    # Yahoo throttles the default python-requests agent with 429s
+    session.headers["User-Agent"] = "Mozilla/5.0 (compatible; StockSentimentApp/1.0)"
+    # Retry-After is handled by fetch_feed's back-off, not by sleeping here
+    retry = Retry(total=2, backoff_factor=0.2, respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+RSS_URL = "https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US"
+
+# One entry per feed URL, i.e. per ticker anyone has typed
+MAX_CACHED_FEEDS = 256
+
+def evict_oldest(cache, max_entries):
+    # Drop the oldest insertions past max_entries; pop() tolerates concurrent evictions
+    for key in list(cache)[:max(0, len(cache) - max_entries)]:
+        cache.pop(key, None)
+
+@st.cache_resource
+def load_feed_cache():
+    # url -> (etag, last_modified, [(title, published)]) from the last full response
+    return {}
+
+@st.cache_resource
+def load_rate_limits():
+    # url -> time before which the feed must not be requested again
+    return {}
+
+def retry_after_seconds(resp, default=60):
+    value = resp.headers.get("Retry-After", "")
+    return int(value) if value.isdigit() else default
+
+# Fetch/parse failures, caught where the feed is requested
+FEED_ERRORS = (requests.RequestException, ValueError, TypeError)
+
+def fetch_feed(session, feed_cache, rate_limits, url):
+    cached = feed_cache.get(url)
+    if time.time() < rate_limits.get(url, 0):
+        # Still backing off after a 429: serve the last copy rather than re-asking
+        if cached:
+            return cached[2]
+        raise requests.HTTPError(f"Rate limited: {url}")
+
+    headers = {}
+    if cached:
+        etag, modified, articles = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+    resp = session.get(url, headers=headers, timeout=3)
+    if resp.status_code == 304 and cached:
+        return articles
+    if resp.status_code == 429:
+        rate_limits[url] = time.time() + retry_after_seconds(resp)
+        evict_oldest(rate_limits, MAX_CACHED_FEEDS)
+        if cached:
+            return articles
+    resp.raise_for_status()
+
     articles = []
-    for entry in feed.entries[:20]:  # up to 20 articles
-        title = entry.title
-        link = entry.link
-        date = datetime.datetime(*entry.published_parsed[:6])
-        sentiment = analyze_sentiment(title)
-        articles.append({"Title": title, "Link": link, "Date": date, "Sentiment Score": sentiment})
-    return pd.DataFrame(articles)
+    # Only titles and dates are read, so skip HTML sanitizing and URI resolving
+    feed = feedparser.parse(
+        resp.content,
+        response_headers={k.lower(): v for k, v in resp.headers.items()},
+        sanitize_html=False,
+        resolve_relative_uris=False,
+    )
+    for entry in feed.entries:
+        title, published = entry.get("title"), entry.get("published_parsed")
+        # Skip malformed entries instead of failing the whole feed
+        if not (title and published):
+            continue
+        articles.append((title, calendar.timegm(published)))
+    feed_cache[url] = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), articles)
+    evict_oldest(feed_cache, MAX_CACHED_FEEDS)
+    return articles
+
+def fetch_articles(ticker, n):
+    session = load_http_session()
+    articles = fetch_feed(session, load_feed_cache(), load_rate_limits(), RSS_URL.format(ticker=ticker))
+    # Columns rather than per-row dicts, so the DataFrame builds without type inference
+    titles, published = zip(*articles[:n]) if articles else ((), ())
+    return {"Title": list(titles), "Published": list(published)}
+
+# Headlines are short; anything past this is feed noise, not signal
+MAX_TITLE_CHARS = 512
+
+def clean_title(title):
+    return " ".join(title.split())[:MAX_TITLE_CHARS]
+
+MAX_CACHED_SCORES = 5000
+
+@st.cache_resource
+def load_score_cache():
+    # title -> FinBERT score, shared across sessions so reruns only score new headlines
+    return {}
+
+def score_headlines(titles):
+    score_cache = load_score_cache()
+    # Each distinct headline goes through the model once
+    scores = {title: score_cache.get(title) for title in dict.fromkeys(titles)}
+    new_titles = [title for title, score in scores.items() if score is None]
+    for title, score in zip(new_titles, predict_batch(new_titles)):
+        scores[title] = score_cache[title] = score
+    evict_oldest(score_cache, MAX_CACHED_SCORES)
+    return [scores[title] for title in titles]
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner="Fetching news...")
+def fetch_news_rss(ticker):
+    # Feed errors propagate so they aren't memoized
+    columns = fetch_articles(ticker, MAX_ARTICLES)
+    if not columns["Title"]:
+        return pd.DataFrame()
+    # Only a non-empty feed loads the model
+    warm_finbert()
+    titles = tuple(clean_title(title) for title in columns["Title"])
+    df = pd.DataFrame({
+        "Title": columns["Title"],
+        # Epoch seconds to datetime64 in one vectorized conversion
+        "Date": pd.to_datetime(columns["Published"], unit="s"),
+        "Sentiment Score": np.asarray(score_headlines(titles), dtype=np.float32),
+    })
+    return df
+
+# =========================
+# CHARTS
+# =========================
+# Read-only summaries: render static, without Plotly's interaction layer
+CHART_CONFIG = {"staticPlot": True, "displayModeBar": False}
+
+# Bar color per sentiment bucket (negative, neutral, positive)
+BAR_COLORS = np.array(["#ef4444", "#94a3b8", "#22c55e"])
+
+@st.cache_data(show_spinner=False)
+def build_pie(pos_count, neu_count, neg_count):
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[go.Pie(
+        labels=["Positive", "Neutral", "Negative"],
+        values=[pos_count, neu_count, neg_count],
+        marker_colors=["#22c55e", "#cbd5e1", "#ef4444"],
+        texttemplate="%{percent:.1%}",
+        sort=False,
+        direction="counterclockwise",
+        rotation=90
+    )])
+    fig.update_layout(height=700)
+    return fig.to_dict()
+
+@st.cache_data(show_spinner=False)
+def build_bar(scores, labels, colors):
+    import plotly.graph_objects as go
+    # Taller figure to align with pie chart
+    fig = go.Figure(data=[go.Bar(
+        x=scores,
+        y=labels,
+        orientation="h",
+        marker_color=colors,
+        width=0.7  # thicker bars
+    )])
+    fig.update_layout(
+        height=700,
+        font=dict(size=14),
+        xaxis_title="Sentiment Score",
+        yaxis_title="Headline (first 8 words)",
+        yaxis=dict(autorange="reversed")  # largest score on top
+    )
+    return fig.to_dict()
 
 if ticker:
-    df = fetch_news_rss(ticker)
+    try:
+        df = fetch_news_rss(ticker)
+    except FEED_ERRORS:
+        df = pd.DataFrame()
     if df.empty:
         st.warning("No news articles found for this ticker.")
     else:
         # =========================
         # METRICS
         # =========================
-        avg_sent = df["Sentiment Score"].mean()
+        scores = df["Sentiment Score"].to_numpy()
+        avg_sent = scores.mean()
+        # Buckets 0/1/2 = negative/neutral/positive, shared by counts and bar colors
+        buckets = np.sign(scores).astype(np.int8) + 1
+        neg_count, neu_count, pos_count = np.bincount(buckets, minlength=3).tolist()
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Average Sentiment", f"{avg_sent:.2f}")
         with col2:
-            st.metric("Positive Articles", f"{(df['Sentiment Score'] > 0).sum()}")
+            st.metric("Positive Articles", f"{pos_count}")
         with col3:
-            st.metric("Negative Articles", f"{(df['Sentiment Score'] < 0).sum()}")
+            st.metric("Negative Articles", f"{neg_count}")
 
         # =========================
         # CHARTS: PIE + BAR (side by side)
@@ -92,59 +247,33 @@ if ticker:
         # --- PIE CHART ---
         with col_pie:
             st.markdown("### 🥧 Sentiment Distribution")
-            sentiment_counts = {
-                "Positive": (df["Sentiment Score"] > 0).sum(),
-                "Neutral": (df["Sentiment Score"] == 0).sum(),
-                "Negative": (df["Sentiment Score"] < 0).sum()
-            }
-            fig1, ax1 = plt.subplots(figsize=(5,7))
-            ax1.pie(
-                sentiment_counts.values(),
-                labels=sentiment_counts.keys(),
-                autopct="%1.1f%%",
-                startangle=90,
-                colors=["#22c55e", "#cbd5e1", "#ef4444"]
-            )
-            ax1.axis("equal")
-            st.pyplot(fig1)
+            fig1 = build_pie(pos_count, neu_count, neg_count)
+            st.plotly_chart(fig1, use_container_width=True, config=CHART_CONFIG)
 
         # --- BAR CHART ---
         with col_bar:
             st.markdown("### 📊 Sentiment Score by Article")
-            df_sorted = df.sort_values(by="Sentiment Score", ascending=False)
-            df_sorted["ShortTitle"] = df_sorted["Title"].apply(
-                lambda x: " ".join(x.split()[:8]) + ("..." if len(x.split())>8 else "")
-            )
-
-            # Taller figure to align with pie chart
-            fig2, ax2 = plt.subplots(figsize=(6,7))
-            bars = ax2.barh(
-                df_sorted["ShortTitle"],
-                df_sorted["Sentiment Score"],
-                color=df_sorted["Sentiment Score"].apply(
-                    lambda x: "#22c55e" if x>0 else "#ef4444" if x<0 else "#94a3b8"
-                ),
-                height=0.7  # thicker bars
-            )
-
-            # Font size and spacing
-            ax2.set_yticks(range(len(df_sorted)))
-            ax2.set_yticklabels(df_sorted["ShortTitle"], fontsize=14)
-            ax2.set_xlabel("Sentiment Score", fontsize=14)
-            ax2.set_ylabel("Headline (first 8 words)", fontsize=14)
-            ax2.margins(y=0.15)
-            ax2.invert_yaxis()  # largest score on top
-
-            st.pyplot(fig2)
+            order = np.argsort(-scores, kind="stable")
+            # At most 8 splits: enough to take 8 words and tell if any were cut
+            words = df["Title"].iloc[order].str.split(n=8)
+            short_titles = words.str[:8].str.join(" ") + np.where(words.str.len() > 8, "...", "")
+            fig2 = build_bar(tuple(scores[order]), tuple(short_titles), tuple(BAR_COLORS[buckets[order]]))
+            st.plotly_chart(fig2, use_container_width=True, config=CHART_CONFIG)
 
         # =========================
         # NEWS TABLE
         # =========================
         st.markdown("### 🗞️ News Headlines")
         st.dataframe(
-            df[["Date","Title","Sentiment Score"]],
+            df,
+            column_order=("Date", "Title", "Sentiment Score"),
             use_container_width=True,
-            height=700
+            height=700,
+            column_config={
+                "Sentiment Score": st.column_config.ProgressColumn(
+                    "Sentiment Score", min_value=-1.0, max_value=1.0, format="%.2f"
+                ),
+            }
         )
 else:
     st.info("Enter a stock ticker to start analyzing sentiment.")
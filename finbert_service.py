@@ -0,0 +1,100 @@
+import logging
+import os
+import shutil
+import threading
+
+# Let the Rust tokenizer encode a batch across threads; must be set before
+# tokenizers is first imported
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+# torch/transformers/optimum are imported inside the loaders so importing this
+# module (and rendering the app's landing page) doesn't pay for them
+
+# Any checkpoint with negative/neutral/positive labels can stand in, e.g. a
+# smaller student distilled from FinBERT on financial headlines
+FINBERT_MODEL = os.environ.get("FINBERT_MODEL", "ProsusAI/finbert")
+# Exported + int8-quantized copy of the model, built on first run
+ONNX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "finbert-onnx", FINBERT_MODEL.replace("/", "--")
+)
+
+# Polarity sign per label name; class order comes from id2label (FinBERT's is positive, negative, neutral)
+LABEL_SIGNS = {"negative": -1, "neutral": 0, "positive": 1}
+
+# Headlines run 5-20 tokens; attention cost grows with sequence length
+MAX_TOKENS = 64
+
+logger = logging.getLogger(__name__)
+
+# One tokenizer/model per process, shared by every app and session importing this module
+_lock = threading.Lock()
+_tokenizer = None
+_model = None
+
+def load_onnx_finbert():
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    if not os.path.isdir(ONNX_DIR):
+        tmp_dir = ONNX_DIR + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(ONNX_DIR), exist_ok=True)
+        exported = ORTModelForSequenceClassification.from_pretrained(FINBERT_MODEL, export=True)
+        # Dynamic quantization of the Linear/MatMul weights; reduce_range keeps
+        # the u8s8 kernels from saturating on CPUs without VNNI
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, reduce_range=True)
+        ORTQuantizer.from_pretrained(exported).quantize(save_dir=tmp_dir, quantization_config=qconfig)
+        os.replace(tmp_dir, ONNX_DIR)
+    # ORT sessions default to ORT_ENABLE_ALL graph optimizations
+    return ORTModelForSequenceClassification.from_pretrained(ONNX_DIR, file_name="model_quantized.onnx")
+
+def warm_up(tokenizer, model):
+    import torch
+    # One throwaway forward pass so the first real lookup doesn't pay for
+    # lazy kernel and thread-pool initialization
+    with torch.inference_mode():
+        model(**tokenizer(["warm up"], return_tensors="pt"))
+
+def load_finbert():
+    global _tokenizer, _model
+    with _lock:
+        if _model is None:
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            tokenizer = AutoTokenizer.from_pretrained(FINBERT_MODEL, use_fast=True)
+            try:
+                model = load_onnx_finbert()
+                warm_up(tokenizer, model)
+                logger.info("Serving %s through ONNX Runtime (int8) from %s", FINBERT_MODEL, ONNX_DIR)
+            except Exception as exc:
+                # Any failure exporting, loading or running the ONNX model
+                # (ORT and optimum errors aren't one type): serve PyTorch instead
+                logger.warning("ONNX Runtime unavailable (%s); serving %s with PyTorch", exc, FINBERT_MODEL)
+                # SDPA is the fused-attention kernel BetterTransformer used to patch in
+                model = AutoModelForSequenceClassification.from_pretrained(FINBERT_MODEL, attn_implementation="sdpa")
+                # bf16 weights only pay off with native AVX512-BF16/AMX kernels; on
+                # other CPUs bf16 matmuls are emulated, so quantize the Linear
+                # layers to int8 (FBGEMM) instead
+                if getattr(torch.cpu, "_is_avx512_bf16_supported", lambda: False)():
+                    model = model.to(torch.bfloat16)
+                else:
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                warm_up(tokenizer, model)
+            _tokenizer, _model = tokenizer, model
+    return _tokenizer, _model
+
+def predict_batch(titles, batch_size=32):
+    import torch
+    if not titles:
+        return []
+    tokenizer, model = load_finbert()
+    logits = []
+    for start in range(0, len(titles), batch_size):
+        batch = list(titles[start:start + batch_size])
+        inputs = tokenizer(batch, return_tensors="pt", truncation=True, padding="longest", max_length=MAX_TOKENS)
+        with torch.inference_mode():
+            logits.append(model(**inputs).logits.float())
+    scores = torch.nn.functional.softmax(torch.cat(logits), dim=-1)
+    conf, idx = scores.max(dim=-1)
+    id2label = model.config.id2label
+    signs = torch.tensor([LABEL_SIGNS[id2label[i].lower()] for i in range(len(id2label))], dtype=conf.dtype)
+    return (signs[idx] * conf).tolist()